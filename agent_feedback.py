@@ -1,10 +1,8 @@
-from langchain_google_genai import ChatGoogleGenerativeAI
 import os
 import pandas as pd
 from dotenv import load_dotenv
 
 load_dotenv()
-os.environ["GOOGLE_API_KEY"] = os.getenv("GOOGLE_API_KEY")
 
 def analyze_charts_with_gemini(output_dir: str, df: pd.DataFrame = None):
     """
@@ -94,6 +92,12 @@ Use the actual numbers and category names from the data. Be specific and data-dr
 Output format: Clean Markdown with headers (##, ###), bullet points, and bold text for emphasis.
 """
     
+    if not os.getenv("GOOGLE_API_KEY"):
+        raise RuntimeError("GOOGLE_API_KEY is not set; cannot generate Gemini feedback.")
+
+    # Imported here so the LLM stack is only loaded when feedback is requested
+    from langchain_google_genai import ChatGoogleGenerativeAI
+
     model = ChatGoogleGenerativeAI(model="gemini-2.5-flash", temperature=0.3)
     
     print("🧠 Calling Gemini model with actual data...")
@@ -0,0 +1,57 @@
+import sys
+import json
+import statistics
+import subprocess
+
+# Each case is timed in a fresh interpreter so nothing is already cached in sys.modules.
+CASES = {
+    # Like-for-like: what importing main.py used to load, versus what it loads now.
+    # The LLM stack is timed on its own so a missing package does not hide the rest.
+    "import main, eager plotting (before)": "import main, plotly.express, seaborn, matplotlib.pyplot, markdown",
+    "import main, lazy (after)": "import main",
+    "eager LLM stack (also before)": "import langchain_google_genai",
+}
+
+HEAVY_MODULES = ["plotly", "seaborn", "matplotlib", "langchain_google_genai", "markdown"]
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+try:
+    exec({statement!r})
+    error = None
+except Exception as e:
+    error = f"{{type(e).__name__}}: {{e}}"
+elapsed = time.perf_counter() - start
+heavy = [m for m in {heavy!r} if m in sys.modules]
+print(json.dumps({{"seconds": elapsed, "error": error, "heavy": heavy}}))
+"""
+
+
+def time_import(statement, repeats=5):
+    """Runs `statement` in fresh interpreters and returns the median wall time."""
+    runs = []
+    for _ in range(repeats):
+        output = subprocess.run(
+            [sys.executable, "-c", PROBE.format(statement=statement, heavy=HEAVY_MODULES)],
+            capture_output=True, text=True,
+        )
+        runs.append(json.loads(output.stdout.strip().splitlines()[-1]))
+        if runs[-1]["error"]:
+            break
+    return {
+        "seconds": statistics.median(run["seconds"] for run in runs),
+        "error": runs[-1]["error"],
+        "heavy": runs[-1]["heavy"],
+    }
+
+
+if __name__ == "__main__":
+    print("--- Import-time Benchmark (median of fresh interpreters) ---")
+    for label, statement in CASES.items():
+        result = time_import(statement)
+        if result["error"]:
+            print(f"{label:<42} failed: {result['error']}")
+            continue
+        heavy = ", ".join(result["heavy"]) or "none"
+        print(f"{label:<42} {result['seconds'] * 1000:8.1f} ms   heavy modules loaded: {heavy}")
@@ -1,4 +1,4 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException, Request
+from fastapi import FastAPI, File, UploadFile, HTTPException, Request, Query
 from fastapi.responses import FileResponse, HTMLResponse, RedirectResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
@@ -7,10 +7,10 @@ from dotenv import load_dotenv
 import os
 import shutil
 import uuid
-import markdown
 
 # --- Custom Imports ---
-from pipeline_logic import load_and_clean_data, predict_categories, generate_strategic_insights
+from market_store import query_cube
+from session_stages import STAGES, load_stage_status, run_session
 
 # --- Load Environment Variables ---
 load_dotenv()
@@ -25,13 +25,31 @@ templates = Jinja2Templates(directory="templates")
 RESULTS_DIR = "results"
 os.makedirs(RESULTS_DIR, exist_ok=True)
 
-# --- Helper Function ---
+# "full" renders charts and Gemini feedback; "predict" only tags products and
+# never loads the plotting or LLM stacks.
+SERVICE_PROFILE = os.getenv("SERVICE_PROFILE", "full").lower()
+
+# --- Helper Functions ---
+def session_stages():
+    """Stages run for an upload under the current service profile."""
+    if SERVICE_PROFILE == "predict":
+        return ["clean", "predict", "aggregate"]
+    return list(STAGES)
+
 def cleanup_files(session_dir: str):
     """Background task to clean up a session's result files."""
     print(f"🧹 Cleaning up results directory: {session_dir}")
     if os.path.exists(session_dir):
         shutil.rmtree(session_dir)
 
+def reject_invalid_upload(session_dir: str, results: dict):
+    """Drops the session and returns 400 when a stage found the upload itself unusable."""
+    invalid = [stage for stage, result in results.items() if result == "invalid"]
+    if invalid:
+        error = load_stage_status(session_dir).get(invalid[0], {}).get("error", "")
+        cleanup_files(session_dir)
+        raise HTTPException(status_code=400, detail=f"Invalid input file: {error}")
+
 # --- Routes ---
 @app.get("/", response_class=HTMLResponse)
 async def read_root(request: Request):
@@ -48,30 +66,76 @@ async def upload_and_process(file: UploadFile = File(...)):
 
     input_filepath = os.path.join(session_dir, "input.csv")
 
-    try:
-        # Save uploaded file
-        with open(input_filepath, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-
-        # Step 1: Data processing and prediction
-        df = load_and_clean_data(input_filepath)
-        predicted_df = predict_categories(df)
-        predicted_df.to_csv(os.path.join(session_dir, "tagged_products.csv"), index=False)
-
-        # Step 2: Generate charts and insights (includes Gemini feedback)
-        result = generate_strategic_insights(predicted_df, session_dir)  # REMOVED .copy()
-        
-        print(f"✅ Processing complete for session: {session_id}")
-        if result:
-            print(f"✅ Feedback length: {len(result.get('feedback', ''))} characters")
-
-    except Exception as e:
-        print(f"❌ Error during processing: {str(e)}")
-        cleanup_files(session_dir)
-        raise HTTPException(status_code=500, detail=f"An error occurred: {e}")
+    # Save uploaded file
+    with open(input_filepath, "wb") as buffer:
+        shutil.copyfileobj(file.file, buffer)
+
+    # Run clean -> predict -> aggregate -> charts -> feedback, checkpointing each
+    # stage so a failure late in the pipeline keeps the earlier work.
+    results = run_session(session_dir, session_id, stages=session_stages())
+    reject_invalid_upload(session_dir, results)
+    print(f"✅ Processing finished for session {session_id}: {results}")
+
+    return RedirectResponse(url=f"/results/{session_id}", status_code=303)
+
+@app.post("/retry/{session_id}")
+async def retry_session(session_id: str, stage: str = None):
+    """
+    Re-runs every incomplete stage of an existing session, or one stage and
+    everything after it; later stages with unchanged inputs hit their checkpoints.
+    """
+    session_dir = os.path.join(RESULTS_DIR, session_id)
+    if not os.path.exists(session_dir):
+        raise HTTPException(status_code=404, detail="Results not found.")
+
+    if stage is None:
+        results = run_session(session_dir, session_id, stages=session_stages())
+    elif stage in session_stages():
+        enabled = session_stages()
+        results = run_session(session_dir, session_id, stages=enabled[enabled.index(stage):])
+    elif stage in STAGES:
+        raise HTTPException(status_code=400, detail=f"Stage '{stage}' is disabled in the '{SERVICE_PROFILE}' profile.")
+    else:
+        raise HTTPException(status_code=400, detail=f"Unknown stage: {stage}")
+    print(f"🔁 Retry finished for session {session_id}: {results}")
 
     return RedirectResponse(url=f"/results/{session_id}", status_code=303)
 
+@app.post("/predict/")
+async def predict_only(file: UploadFile = File(...)):
+    """Tags an uploaded CSV and returns the tagged products without charts or feedback."""
+    if not file.filename.endswith(".csv"):
+        raise HTTPException(status_code=400, detail="Invalid file type. Please upload a CSV.")
+
+    session_id = str(uuid.uuid4())
+    session_dir = os.path.join(RESULTS_DIR, session_id)
+    os.makedirs(session_dir, exist_ok=True)
+
+    input_filepath = os.path.join(session_dir, "input.csv")
+    tagged_filepath = os.path.join(session_dir, "tagged_products.csv")
+
+    with open(input_filepath, "wb") as buffer:
+        shutil.copyfileobj(file.file, buffer)
+
+    # Same clean -> predict -> aggregate stages as an upload, so these runs are
+    # monitored and stored too; a failed aggregate does not withhold the tags.
+    results = run_session(session_dir, session_id, stages=["clean", "predict", "aggregate"])
+    reject_invalid_upload(session_dir, results)
+    if results.get("predict") != "completed":
+        stage_status = load_stage_status(session_dir)
+        error = next((record.get("error") for record in stage_status.values() if record.get("status") != "completed"), "")
+        cleanup_files(session_dir)
+        raise HTTPException(status_code=500, detail=f"An error occurred: {error}")
+    if results.get("aggregate") != "completed":
+        print(f"⚠️ Monitoring and market store update failed for session {session_id}")
+
+    return FileResponse(
+        path=tagged_filepath,
+        media_type="text/csv",
+        filename="tagged_products.csv",
+        background=BackgroundTask(cleanup_files, session_dir),
+    )
+
 @app.get("/results/{session_id}", response_class=HTMLResponse)
 async def get_results_page(request: Request, session_id: str):
     session_dir = os.path.join(RESULTS_DIR, session_id)
@@ -89,6 +153,7 @@ async def get_results_page(request: Request, session_id: str):
                 feedback_content = f.read()
             
             # Convert markdown to HTML for proper rendering
+            import markdown
             feedback_html = markdown.markdown(feedback_content, extensions=['extra', 'nl2br'])
             
             print(f"✅ Loaded feedback: {len(feedback_content)} characters")
@@ -99,12 +164,25 @@ async def get_results_page(request: Request, session_id: str):
         print(f"⚠️ Feedback file not found: {feedback_file}")
         feedback_html = "<p><em>No AI feedback generated yet. Please refresh the page.</em></p>"
 
+    stage_status = load_stage_status(session_dir)
+    charts = {
+        name: os.path.exists(os.path.join(session_dir, filename))
+        for name, filename in (
+            ("sunburst", "insight_1_market_overview.html"),
+            ("violin", "insight_2_price_landscape.png"),
+            ("bubble", "insight_3_opportunity_matrix.png"),
+        )
+    }
+
     return templates.TemplateResponse(
         "results.html",
         {
             "request": request,
             "session_id": session_id,
-            "feedback": feedback_html  # Pass HTML-rendered markdown
+            "feedback": feedback_html,  # Pass HTML-rendered markdown
+            "stages": stage_status,
+            "charts": charts,
+            "enabled_stages": session_stages(),
         },
     )
 
@@ -126,3 +204,33 @@ async def download_results(session_id: str):
         filename="product_attribution_results.zip",
         background=cleanup_task,
     )
+
+@app.get("/analytics/cube")
+async def get_market_cube(
+    group_by: str = Query("level1", description="Comma-separated cube dimensions"),
+    level1: str = None,
+    level2: str = None,
+    level3: str = None,
+    clientb_department: str = None,
+    price_tier: str = None,
+    start_date: str = None,
+    end_date: str = None,
+):
+    """Trend and share-of-shelf queries over every ingested session.
+
+    Group by `ingest_date` for trends; `share` gives each group's share of shelf
+    within the filtered slice.
+    """
+    dimensions = [col.strip() for col in group_by.split(",") if col.strip()]
+    filters = {
+        "level1": level1,
+        "level2": level2,
+        "level3": level3,
+        "clientb_department": clientb_department,
+        "price_tier": price_tier,
+    }
+    try:
+        rows = query_cube(dimensions, filters, start_date, end_date)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"group_by": dimensions, "rows": rows}
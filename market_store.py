@@ -0,0 +1,317 @@
+import os
+import math
+import sqlite3
+from datetime import date, datetime
+
+import pandas as pd
+
+# Kept outside results/, which main.py serves publicly under /output.
+STORE_DIR = "store"
+STORE_PATH = os.path.join(STORE_DIR, "market_store.db")
+
+# Cube dimensions, in the order they are stored and grouped on.
+CUBE_DIMENSIONS = ["level1", "level2", "level3", "clientb_department", "price_tier", "ingest_date"]
+
+# Prices are bucketed on a log scale so that quantiles can be merged across
+# sessions: 20 buckets per decade, from ₹1 up to ₹10^7.
+BUCKETS_PER_DECADE = 20
+MAX_BUCKET = 7 * BUCKETS_PER_DECADE
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS ingested_sessions (
+    session_id TEXT PRIMARY KEY,
+    ingest_date TEXT NOT NULL,
+    row_count INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS tagged_products (
+    session_id TEXT NOT NULL,
+    ingest_date TEXT NOT NULL,
+    product_id TEXT,
+    product_name TEXT,
+    actual_price REAL,
+    level1 TEXT,
+    level2 TEXT,
+    level3 TEXT,
+    clientb_department TEXT,
+    price_tier TEXT,
+    price_bucket INTEGER
+);
+CREATE TABLE IF NOT EXISTS price_cube (
+    level1 TEXT NOT NULL,
+    level2 TEXT NOT NULL,
+    level3 TEXT NOT NULL,
+    clientb_department TEXT NOT NULL,
+    price_tier TEXT NOT NULL,
+    ingest_date TEXT NOT NULL,
+    product_count INTEGER NOT NULL,
+    price_sum REAL NOT NULL,
+    price_min REAL NOT NULL,
+    price_max REAL NOT NULL,
+    PRIMARY KEY (level1, level2, level3, clientb_department, price_tier, ingest_date)
+);
+CREATE TABLE IF NOT EXISTS price_histogram (
+    level1 TEXT NOT NULL,
+    level2 TEXT NOT NULL,
+    level3 TEXT NOT NULL,
+    clientb_department TEXT NOT NULL,
+    price_tier TEXT NOT NULL,
+    ingest_date TEXT NOT NULL,
+    bucket INTEGER NOT NULL,
+    product_count INTEGER NOT NULL,
+    PRIMARY KEY (level1, level2, level3, clientb_department, price_tier, ingest_date, bucket)
+);
+CREATE INDEX IF NOT EXISTS idx_cube_date ON price_cube (ingest_date);
+CREATE INDEX IF NOT EXISTS idx_tagged_session ON tagged_products (session_id);
+CREATE INDEX IF NOT EXISTS idx_tagged_date ON tagged_products (ingest_date);
+"""
+
+
+def connect(store_path=STORE_PATH):
+    """Opens the market store, creating the schema on first use."""
+    os.makedirs(os.path.dirname(store_path) or ".", exist_ok=True)
+    conn = sqlite3.connect(store_path)
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def price_bucket(price):
+    """Maps a price onto its log-scale histogram bucket."""
+    if price is None or not price > 1:
+        return 0
+    return min(int(math.log10(price) * BUCKETS_PER_DECADE), MAX_BUCKET)
+
+
+def bucket_upper_bound(bucket):
+    """Returns the upper price bound of a histogram bucket."""
+    return 10 ** ((bucket + 1) / BUCKETS_PER_DECADE)
+
+
+def _to_store_frame(df, session_id, ingest_date):
+    """Normalises a tagged DataFrame into the store's row layout."""
+    if 'predicted_level_1' in df.columns:
+        levels = df[['predicted_level_1', 'predicted_level_2', 'predicted_level_3']].copy()
+    else:
+        # Older sessions only saved the joined Client A category.
+        levels = df['predicted_clienta_category'].str.split(' > ', expand=True, n=2).reindex(columns=[0, 1, 2])
+    levels.columns = ['level1', 'level2', 'level3']
+
+    rows = pd.DataFrame({
+        'session_id': session_id,
+        'ingest_date': ingest_date,
+        'product_id': df['product_id'] if 'product_id' in df.columns else None,
+        'product_name': df['product_name'],
+        'actual_price': pd.to_numeric(df['actual_price'], errors='coerce'),
+        'level1': levels['level1'],
+        'level2': levels['level2'],
+        'level3': levels['level3'],
+        'clientb_department': df['predicted_clientb_department'],
+        'price_tier': df['predicted_clientb_price_tier'],
+    }, index=df.index)
+    rows.dropna(subset=['actual_price'], inplace=True)
+    rows.fillna({col: 'N/A' for col in CUBE_DIMENSIONS}, inplace=True)
+    return rows
+
+
+def store_tagged_products(df, session_id, ingest_date=None, store_path=STORE_PATH):
+    """
+    Writes a session's tagged products to the store, replacing anything stored
+    for that session before, and rebuilds the cube cells the session touches.
+    A session keeps the ingest date it was first stored with.
+    Returns the number of rows stored.
+    """
+    dims = ", ".join(CUBE_DIMENSIONS)
+    cell_match = f"ingest_date = ? AND ({dims}) IN (SELECT {dims} FROM temp.affected_cells)"
+
+    conn = connect(store_path)
+    try:
+        with conn:
+            seen = conn.execute("SELECT ingest_date FROM ingested_sessions WHERE session_id = ?", (session_id,)).fetchone()
+            ingest_date = seen[0] if seen else (ingest_date or date.today().isoformat())
+
+            rows = _to_store_frame(df, session_id, ingest_date)
+            rows['price_bucket'] = rows['actual_price'].map(price_bucket)
+
+            # Cells holding this session's previous rows and its new ones
+            conn.execute(f"CREATE TEMP TABLE IF NOT EXISTS affected_cells ({dims})")
+            conn.execute("DELETE FROM temp.affected_cells")
+            conn.execute(
+                f"INSERT INTO temp.affected_cells SELECT DISTINCT {dims} FROM tagged_products WHERE session_id = ?",
+                (session_id,),
+            )
+            conn.executemany(
+                f"INSERT INTO temp.affected_cells VALUES ({', '.join('?' * len(CUBE_DIMENSIONS))})",
+                rows[CUBE_DIMENSIONS].drop_duplicates().itertuples(index=False, name=None),
+            )
+
+            conn.execute("DELETE FROM tagged_products WHERE session_id = ?", (session_id,))
+            conn.execute(
+                "INSERT OR REPLACE INTO ingested_sessions VALUES (?, ?, ?)",
+                (session_id, ingest_date, len(rows)),
+            )
+            conn.executemany(
+                "INSERT INTO tagged_products VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows.itertuples(index=False, name=None),
+            )
+
+            # Re-aggregate only the touched cells; they all share the session's ingest date
+            conn.execute(f"DELETE FROM price_cube WHERE {cell_match}", (ingest_date,))
+            conn.execute(
+                f"""
+                INSERT INTO price_cube
+                SELECT {dims}, COUNT(*), SUM(actual_price), MIN(actual_price), MAX(actual_price)
+                FROM tagged_products WHERE {cell_match}
+                GROUP BY {dims}
+                """,
+                (ingest_date,),
+            )
+            conn.execute(f"DELETE FROM price_histogram WHERE {cell_match}", (ingest_date,))
+            conn.execute(
+                f"""
+                INSERT INTO price_histogram
+                SELECT {dims}, price_bucket, COUNT(*)
+                FROM tagged_products WHERE {cell_match}
+                GROUP BY {dims}, price_bucket
+                """,
+                (ingest_date,),
+            )
+    finally:
+        conn.close()
+
+    action = "Replaced" if seen else "Stored"
+    print(f"✅ {action} {len(rows)} products from session {session_id} in market store")
+    return len(rows)
+
+
+def backfill_from_results(results_dir="results", store_path=STORE_PATH):
+    """Ingests every existing results/<session>/tagged_products.csv not yet in the store."""
+    conn = connect(store_path)
+    try:
+        ingested = {row[0] for row in conn.execute("SELECT session_id FROM ingested_sessions")}
+    finally:
+        conn.close()
+
+    total = 0
+    for session_id in sorted(os.listdir(results_dir)):
+        tagged_path = os.path.join(results_dir, session_id, "tagged_products.csv")
+        if session_id in ingested or not os.path.isfile(tagged_path):
+            continue
+        ingest_date = datetime.fromtimestamp(os.path.getmtime(tagged_path)).date().isoformat()
+        total += store_tagged_products(pd.read_csv(tagged_path), session_id, ingest_date, store_path)
+    return total
+
+
+def _where_clause(filters, start_date, end_date):
+    clauses, params = [], []
+    for column, value in (filters or {}).items():
+        if column not in CUBE_DIMENSIONS:
+            raise ValueError(f"Unknown cube dimension: {column}")
+        if value is not None:
+            clauses.append(f"{column} = ?")
+            params.append(value)
+    if start_date:
+        clauses.append("ingest_date >= ?")
+        params.append(start_date)
+    if end_date:
+        clauses.append("ingest_date <= ?")
+        params.append(end_date)
+    return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+
+def _quantile(buckets, q):
+    """
+    Approximates a quantile from (bucket, count) pairs sorted by bucket,
+    interpolating log-linearly inside the bucket that holds the target rank.
+    """
+    total = sum(count for _, count in buckets)
+    if total == 0:
+        return None
+    target = q * total
+    running = 0
+    for bucket, count in buckets:
+        if running + count >= target:
+            fraction = (target - running) / count
+            return round(10 ** ((bucket + fraction) / BUCKETS_PER_DECADE), 2)
+        running += count
+    return round(bucket_upper_bound(buckets[-1][0]), 2)
+
+
+def _clamp(value, low, high):
+    return None if value is None else min(max(value, low), high)
+
+
+def query_cube(group_by, filters=None, start_date=None, end_date=None, store_path=STORE_PATH):
+    """
+    Answers aggregate questions from the cubes alone.
+    Groups by any subset of CUBE_DIMENSIONS and returns, per group, the product
+    count, share of the filtered total, price mean/min/max and p25/p50/p75.
+    When grouping by ingest_date, share is taken within each date and rows come
+    back in date order, so a trend reads as share-of-shelf over time.
+    """
+    unknown = [col for col in group_by if col not in CUBE_DIMENSIONS]
+    if unknown:
+        raise ValueError(f"Unknown cube dimension(s): {', '.join(unknown)}")
+
+    where, params = _where_clause(filters, start_date, end_date)
+    key_sql = ", ".join(group_by) if group_by else "'all'"
+    by_date = "ingest_date" in group_by
+    order_sql = "ingest_date, SUM(product_count) DESC" if by_date else "SUM(product_count) DESC"
+
+    conn = connect(store_path)
+    try:
+        groups = conn.execute(
+            f"""
+            SELECT {key_sql}, SUM(product_count), SUM(price_sum), MIN(price_min), MAX(price_max)
+            FROM price_cube{where}
+            GROUP BY {key_sql}
+            ORDER BY {order_sql}
+            """,
+            params,
+        ).fetchall()
+        histogram_rows = conn.execute(
+            f"""
+            SELECT {key_sql}, bucket, SUM(product_count)
+            FROM price_histogram{where}
+            GROUP BY {key_sql}, bucket
+            ORDER BY bucket
+            """,
+            params,
+        ).fetchall()
+    finally:
+        conn.close()
+
+    width = max(len(group_by), 1)
+    histograms = {}
+    for row in histogram_rows:
+        histograms.setdefault(row[:width], []).append((row[width], row[width + 1]))
+
+    # Share denominators: one per ingest date for trends, else the whole slice
+    date_index = group_by.index("ingest_date") if by_date else None
+    totals = {}
+    for row in groups:
+        period = row[date_index] if by_date else None
+        totals[period] = totals.get(period, 0) + row[width]
+
+    results = []
+    for row in groups:
+        key = row[:width]
+        count, price_sum, price_min, price_max = row[width:]
+        total = totals[key[date_index] if by_date else None]
+        buckets = histograms.get(key, [])
+        result = dict(zip(group_by, key))
+        result.update({
+            "product_count": count,
+            "share": round(count / total, 4) if total else 0.0,
+            "avg_price": round(price_sum / count, 2) if count else None,
+            "min_price": price_min,
+            "max_price": price_max,
+            "p25_price": _clamp(_quantile(buckets, 0.25), price_min, price_max),
+            "p50_price": _clamp(_quantile(buckets, 0.50), price_min, price_max),
+            "p75_price": _clamp(_quantile(buckets, 0.75), price_min, price_max),
+        })
+        results.append(result)
+    return results
+
+
+if __name__ == "__main__":
+    appended = backfill_from_results()
+    print(f"--- Backfilled {appended} products into {STORE_PATH} ---")
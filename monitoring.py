@@ -0,0 +1,210 @@
+import os
+import json
+from datetime import datetime
+
+import numpy as np
+
+MODELS_DIR = "models"
+REFERENCE_PROFILE_FILE = os.path.join(MODELS_DIR, "monitoring_reference.json")
+# Kept outside results/, which main.py serves publicly under /output.
+METRICS_LOG_FILE = os.path.join("store", "monitoring_metrics.jsonl")
+
+# Fixed bin edges, so histograms from different runs are directly comparable.
+PRICE_BINS = [0, 100, 250, 500, 1000, 2500, 5000, 10000, 25000, 50000, np.inf]
+TEXT_LENGTH_BINS = [0, 100, 250, 500, 1000, 1500, 2000, 3000, 5000, np.inf]
+CONFIDENCE_BINS = [0.0, 0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1.0001]
+
+# Predicted column -> label column it is checked against when present.
+AGREEMENT_CHECKS = {
+    'predicted_level_1': 'clienta_level_1',
+    'predicted_level_2': 'clienta_level_2',
+    'predicted_level_3': 'clienta_level_3',
+    'predicted_clienta_category': 'rule_based_clienta_category',
+    'predicted_clientb_department': 'rule_based_clientb_department',
+    'predicted_clientb_price_tier': 'rule_based_clientb_price_tier',
+}
+UNLABELED_VALUES = {'', 'None', 'N/A', 'Needs_ML_Prediction'}
+
+# Predicted column -> key in the reference profile's label distributions.
+LABEL_DRIFT_COLUMNS = {
+    'predicted_level_1': 'level_1',
+    'predicted_clientb_department': 'clientb_department',
+    'predicted_clientb_price_tier': 'clientb_price_tier',
+}
+
+EPSILON = 1e-6
+
+
+def _histogram(values, bins):
+    counts, _ = np.histogram(values.dropna(), bins=bins)
+    return counts.tolist()
+
+
+def _label_counts(values):
+    return {str(k): int(v) for k, v in values.value_counts().items()}
+
+
+def _trainable_label_counts(values, min_count=1):
+    """
+    Label counts restricted to the classes the models were actually fitted on:
+    unlabeled rows and classes below the training cut-off are dropped, as in
+    run_pipeline.train_and_save_models.
+    """
+    values = values[~values.isin(UNLABELED_VALUES)]
+    counts = values.value_counts()
+    counts = counts[counts >= min_count]
+    counts.index = counts.index.astype(str).str.strip()
+    return {k: int(v) for k, v in counts.groupby(level=0).sum().items()}
+
+
+def _distribution(counts, keys=None):
+    """Turns counts (a list, or a dict read in `keys` order) into smoothed proportions."""
+    if keys is not None:
+        counts = [counts.get(k, 0) for k in keys]
+    counts = np.asarray(counts, dtype=float) + EPSILON
+    return counts / counts.sum()
+
+
+def population_stability_index(expected, actual):
+    """PSI between two aligned probability vectors."""
+    return float(np.sum((actual - expected) * np.log(actual / expected)))
+
+
+def kl_divergence(expected, actual):
+    """KL(actual || expected) between two aligned probability vectors."""
+    return float(np.sum(actual * np.log(actual / expected)))
+
+
+def build_reference_profile(df, output_path=REFERENCE_PROFILE_FILE):
+    """
+    Summarises the training data into the histograms drift is measured against.
+    Expects the cleaned ground-truth frame with clienta_level_* columns split out.
+    """
+    profile = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "row_count": int(len(df)),
+        "price_histogram": _histogram(df['actual_price'], PRICE_BINS),
+        "text_length_histogram": _histogram(df['combined_text'].str.len(), TEXT_LENGTH_BINS),
+        # Level 1 and department training drop classes with fewer than 2 rows;
+        # the price tier model keeps every class.
+        "labels": {
+            "level_1": _trainable_label_counts(df['clienta_level_1'], min_count=2),
+            "clientb_department": _trainable_label_counts(df['Client B department'], min_count=2),
+            "clientb_price_tier": _trainable_label_counts(df['Client b Price Tier']),
+        },
+    }
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump(profile, f, indent=2)
+        f.write("\n")
+    print(f"Monitoring reference profile saved to {output_path}")
+    return profile
+
+
+def load_reference_profile(path=REFERENCE_PROFILE_FILE):
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _agreement(df):
+    agreement = {}
+    for predicted_col, label_col in AGREEMENT_CHECKS.items():
+        if predicted_col not in df.columns or label_col not in df.columns:
+            continue
+        labels = df[label_col].astype(str).str.strip()
+        labeled = df[label_col].notna() & ~labels.isin(UNLABELED_VALUES)
+        n = int(labeled.sum())
+        if n == 0:
+            continue
+        matches = int((df.loc[labeled, predicted_col].astype(str) == labels[labeled]).sum())
+        agreement[predicted_col] = {"against": label_col, "labeled_rows": n, "accuracy": round(matches / n, 4)}
+    return agreement
+
+
+def _drift(histograms, labels, reference):
+    drift = {}
+    for name in ("price_histogram", "text_length_histogram"):
+        expected = _distribution(reference[name])
+        actual = _distribution(histograms[name])
+        drift[name.replace("_histogram", "")] = {
+            "psi": round(population_stability_index(expected, actual), 4),
+            "kl": round(kl_divergence(expected, actual), 4),
+        }
+    for predicted_col, ref_key in LABEL_DRIFT_COLUMNS.items():
+        if predicted_col not in labels or ref_key not in reference["labels"]:
+            continue
+        keys = sorted(set(reference["labels"][ref_key]) | set(labels[predicted_col]))
+        expected = _distribution(reference["labels"][ref_key], keys)
+        actual = _distribution(labels[predicted_col], keys)
+        drift[predicted_col] = {
+            "psi": round(population_stability_index(expected, actual), 4),
+            "kl": round(kl_divergence(expected, actual), 4),
+        }
+    return drift
+
+
+def _already_logged(metrics_log, run_id):
+    if not os.path.exists(metrics_log):
+        return False
+    with open(metrics_log, "r", encoding="utf-8") as f:
+        return any(json.loads(line).get("run_id") == run_id for line in f if line.strip())
+
+
+def monitor_predictions(df, output_dir, reference=None, metrics_log=METRICS_LOG_FILE, run_id=None):
+    """
+    Profiles one prediction run: label/price/text-length/confidence histograms,
+    agreement with any labels already on the input, and PSI/KL drift against
+    the training reference. Writes monitoring_report.json into output_dir and
+    appends a one-line summary to the metrics log, unless a line with the same
+    run_id is already there.
+    """
+    reference = reference if reference is not None else load_reference_profile()
+
+    histograms = {
+        "price_histogram": _histogram(df['actual_price'], PRICE_BINS),
+        "text_length_histogram": _histogram(df['combined_text'].str.len(), TEXT_LENGTH_BINS),
+    }
+    confidence = {}
+    for col in [c for c in df.columns if c.startswith('confidence_')]:
+        confidence[col] = {
+            "mean": round(float(df[col].mean()), 4),
+            "histogram": _histogram(df[col], CONFIDENCE_BINS),
+        }
+    labels = {col: _label_counts(df[col]) for col in AGREEMENT_CHECKS if col in df.columns}
+
+    report = {
+        "generated_at": datetime.now().isoformat(timespec="seconds"),
+        "row_count": int(len(df)),
+        "bins": {"price": PRICE_BINS[:-1], "text_length": TEXT_LENGTH_BINS[:-1], "confidence": CONFIDENCE_BINS[:-1]},
+        **histograms,
+        "confidence": confidence,
+        "predicted_labels": labels,
+        "agreement": _agreement(df),
+        "drift": _drift(histograms, labels, reference) if reference else None,
+    }
+
+    os.makedirs(output_dir, exist_ok=True)
+    report_path = os.path.join(output_dir, "monitoring_report.json")
+    with open(report_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    summary = {
+        "run_id": run_id,
+        "generated_at": report["generated_at"],
+        "output_dir": output_dir,
+        "row_count": report["row_count"],
+        "mean_confidence": {col: stats["mean"] for col, stats in confidence.items()},
+        "accuracy": {col: stats["accuracy"] for col, stats in report["agreement"].items()},
+        "psi": {col: stats["psi"] for col, stats in (report["drift"] or {}).items()},
+    }
+    if metrics_log and not (run_id and _already_logged(metrics_log, run_id)):
+        os.makedirs(os.path.dirname(metrics_log) or ".", exist_ok=True)
+        with open(metrics_log, "a", encoding="utf-8") as f:
+            f.write(json.dumps(summary) + "\n")
+
+    if reference is None:
+        print("⚠️ No monitoring reference profile found; drift not computed.")
+    print(f"✅ Monitoring report saved at: {report_path}")
+    return report
@@ -1,10 +1,7 @@
 import pandas as pd
+import numpy as np
 import joblib
 import os
-import plotly.express as px
-import seaborn as sns
-import matplotlib.pyplot as plt
-from agent_feedback import analyze_charts_with_gemini
 
 MODELS_DIR = "models"
 
@@ -18,6 +15,13 @@ def load_and_clean_data(filepath):
     return df
 
 
+def _predict_with_confidence(pipeline, X):
+    """Returns the predicted labels and their class probability in one forest pass."""
+    proba = pipeline.predict_proba(X)
+    best = proba.argmax(axis=1)
+    return pipeline.classes_.take(best), proba[np.arange(len(best)), best]
+
+
 def predict_categories(df):
     """Takes a DataFrame and returns it with all predictions."""
     try:
@@ -30,20 +34,27 @@ def predict_categories(df):
         raise RuntimeError("Model files not found in the 'models' directory.")
 
     # Client A Hierarchical Prediction
-    df['predicted_level_1'] = pipeline_l1.predict(df[['combined_text', 'actual_price']])
-    df['predicted_level_2'] = pipeline_l2.predict(df[['combined_text', 'actual_price', 'predicted_level_1']])
-    df['predicted_level_3'] = pipeline_l3.predict(df[['combined_text', 'actual_price', 'predicted_level_1', 'predicted_level_2']])
+    df['predicted_level_1'], df['confidence_level_1'] = _predict_with_confidence(pipeline_l1, df[['combined_text', 'actual_price']])
+    df['predicted_level_2'], df['confidence_level_2'] = _predict_with_confidence(pipeline_l2, df[['combined_text', 'actual_price', 'predicted_level_1']])
+    df['predicted_level_3'], df['confidence_level_3'] = _predict_with_confidence(pipeline_l3, df[['combined_text', 'actual_price', 'predicted_level_1', 'predicted_level_2']])
     df['predicted_clienta_category'] = df['predicted_level_1'] + ' > ' + df['predicted_level_2'] + ' > ' + df['predicted_level_3']
 
     # Client B Prediction
-    df['predicted_clientb_department'] = pipeline_b_dept.predict(df[['combined_text', 'actual_price']])
-    df['predicted_clientb_price_tier'] = pipeline_b_price.predict(df[['combined_text', 'actual_price']])
+    df['predicted_clientb_department'], df['confidence_clientb_department'] = _predict_with_confidence(pipeline_b_dept, df[['combined_text', 'actual_price']])
+    df['predicted_clientb_price_tier'], df['confidence_clientb_price_tier'] = _predict_with_confidence(pipeline_b_price, df[['combined_text', 'actual_price']])
     
     return df  # Return FULL DataFrame, not just selected columns
 
 
-def generate_strategic_insights(df, output_dir):
-    """Generates charts and AI feedback from tagged DataFrame."""
+def generate_charts(df, output_dir):
+    """Generates the three insight charts from a tagged DataFrame."""
+    # Plotting stack is imported here so prediction-only paths never load it
+    import plotly.express as px
+    import seaborn as sns
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
     os.makedirs(output_dir, exist_ok=True)
     
     print("--- Generating Strategic Insights ---")
@@ -110,22 +121,8 @@ def generate_strategic_insights(df, output_dir):
     plt.savefig(opportunity_path, dpi=300, bbox_inches='tight')
     plt.close()
 
-    # AI Feedback with DataFrame
-    print("\n🧠 Generating strategic feedback with Gemini...")
-    print(f"📊 Passing DataFrame with {len(df)} rows to Gemini")
-    
-    try:
-        feedback = analyze_charts_with_gemini(output_dir, df)  # CRITICAL: Pass df here
-        print(f"✅ Feedback generated: {len(feedback)} chars")
-    except Exception as e:
-        print(f"❌ Error: {str(e)}")
-        feedback = f"Error generating feedback: {str(e)}"
-    
-    print(f"✅ All insights saved to '{output_dir}'")
-    
     return {
         "sunburst": sunburst_path,
         "violin": violin_path,
         "bubble": opportunity_path,
-        "feedback": feedback,
     }
@@ -8,6 +8,8 @@ from sklearn.ensemble import RandomForestClassifier
 from sklearn.pipeline import Pipeline
 from sklearn.compose import ColumnTransformer
 from sklearn.preprocessing import StandardScaler, OneHotEncoder
+from monitoring import build_reference_profile, monitor_predictions
+import pipeline_logic
 
 # --- Configuration: Define file paths ---
 DATA_DIR = "data"
@@ -49,6 +51,9 @@ def train_and_save_models(data_filepath):
     df['clienta_level_3'] = split_cols[2]
     df.fillna('None', inplace=True)
 
+    # Snapshot the training distribution for drift monitoring
+    build_reference_profile(df)
+
     # --- Train Client A: Level 1 Model ---
     print("\nTraining Client A: Level 1 Model...")
     model_df_l1 = df[df['clienta_level_1'] != 'None'].copy()
@@ -163,29 +168,18 @@ def predict_categories(data_filepath):
     new_df = load_and_clean_data(data_filepath)
     if new_df is None: return None
 
-    # Load all trained models
+    # Shared with the web service: hierarchical Client A + Client B prediction with confidences
     try:
-        pipeline_l1 = joblib.load(os.path.join(MODELS_DIR, "pipeline_l1.joblib"))
-        pipeline_l2 = joblib.load(os.path.join(MODELS_DIR, "pipeline_l2.joblib"))
-        pipeline_l3 = joblib.load(os.path.join(MODELS_DIR, "pipeline_l3.joblib"))
-        pipeline_b_dept = joblib.load(os.path.join(MODELS_DIR, "pipeline_clientb_dept.joblib"))
-        pipeline_b_price = joblib.load(os.path.join(MODELS_DIR, "pipeline_clientb_price.joblib"))
-        print("All models loaded successfully.")
-    except FileNotFoundError:
+        new_df = pipeline_logic.predict_categories(new_df)
+    except RuntimeError:
         print("Error: Model files not found. Please run the training function first.")
         return None
-
-    # --- Client A Hierarchical Prediction ---
-    new_df['predicted_level_1'] = pipeline_l1.predict(new_df[['combined_text', 'actual_price']])
-    new_df['predicted_level_2'] = pipeline_l2.predict(new_df[['combined_text', 'actual_price', 'predicted_level_1']])
-    new_df['predicted_level_3'] = pipeline_l3.predict(new_df[['combined_text', 'actual_price', 'predicted_level_1', 'predicted_level_2']])
-    new_df['predicted_clienta_category'] = new_df['predicted_level_1'] + ' > ' + new_df['predicted_level_2'] + ' > ' + new_df['predicted_level_3']
-
-    # --- NEW: Client B Prediction ---
-    new_df['predicted_clientb_department'] = pipeline_b_dept.predict(new_df[['combined_text', 'actual_price']])
-    new_df['predicted_clientb_price_tier'] = pipeline_b_price.predict(new_df[['combined_text', 'actual_price']])
     
     print("--- Prediction Complete ---")
+
+    # Monitor the full frame, which still carries the rule_based_* / clienta_level_*
+    # labels that agreement is measured against; report sits next to predicted.csv
+    monitor_predictions(new_df, DATA_DIR)
     
     # Return a clean dataframe with final predictions
     output_cols = [
@@ -0,0 +1,198 @@
+import os
+import json
+import hashlib
+from datetime import datetime
+
+import pandas as pd
+
+from pipeline_logic import MODELS_DIR, load_and_clean_data, predict_categories
+
+STAGES_FILE = "stages.json"
+
+REQUIRED_COLUMNS = ["product_name", "about_product", "actual_price"]
+
+
+class InvalidInputError(ValueError):
+    """The uploaded file itself is unusable, so retrying the stage cannot help."""
+
+
+MODEL_FILES = [
+    os.path.join(MODELS_DIR, name)
+    for name in (
+        "pipeline_l1.joblib",
+        "pipeline_l2.joblib",
+        "pipeline_l3.joblib",
+        "pipeline_clientb_dept.joblib",
+        "pipeline_clientb_price.joblib",
+    )
+]
+
+
+# --- Stage implementations ---
+# Each stage reads its inputs from the session directory and writes its outputs
+# back into it, so any stage can be re-run on its own from what is on disk.
+
+def _run_clean(session_dir, session_id):
+    input_filepath = os.path.join(session_dir, "input.csv")
+    try:
+        columns = pd.read_csv(input_filepath, nrows=0).columns
+        missing = [col for col in REQUIRED_COLUMNS if col not in columns]
+        if missing:
+            raise InvalidInputError(f"Missing required column(s): {', '.join(missing)}")
+        df = load_and_clean_data(input_filepath)
+    except (pd.errors.ParserError, pd.errors.EmptyDataError, UnicodeDecodeError) as e:
+        raise InvalidInputError(f"Could not read the uploaded CSV: {e}")
+    if df.empty:
+        raise InvalidInputError("No rows with a valid actual_price.")
+    df.to_csv(os.path.join(session_dir, "cleaned.csv"), index=False)
+
+
+def _run_predict(session_dir, session_id):
+    df = pd.read_csv(os.path.join(session_dir, "cleaned.csv"))
+    predicted_df = predict_categories(df)
+    predicted_df.to_csv(os.path.join(session_dir, "tagged_products.csv"), index=False)
+
+
+def _run_aggregate(session_dir, session_id):
+    from market_store import store_tagged_products
+    from monitoring import monitor_predictions
+
+    # One metrics line per distinct set of predictions, however often this re-runs
+    run_id = f"{session_id}:{_fingerprint(session_dir, ['tagged_products.csv'])}"
+    df = pd.read_csv(os.path.join(session_dir, "tagged_products.csv"))
+    monitor_predictions(df, session_dir, run_id=run_id)
+    store_tagged_products(df, session_id)
+
+
+def _run_charts(session_dir, session_id):
+    from pipeline_logic import generate_charts
+
+    df = pd.read_csv(os.path.join(session_dir, "tagged_products.csv"))
+    if generate_charts(df, session_dir) is None:
+        raise RuntimeError("Charts could not be generated from the tagged products.")
+
+
+def _run_feedback(session_dir, session_id):
+    from agent_feedback import analyze_charts_with_gemini
+
+    df = pd.read_csv(os.path.join(session_dir, "tagged_products.csv"))
+    analyze_charts_with_gemini(session_dir, df)
+
+
+# Stage name -> (function, input files, output files). Inputs are relative to the
+# session directory unless absolute or under MODELS_DIR; order is execution order.
+STAGES = {
+    "clean": (_run_clean, ["input.csv"], ["cleaned.csv"]),
+    "predict": (_run_predict, ["cleaned.csv"] + MODEL_FILES, ["tagged_products.csv"]),
+    "aggregate": (_run_aggregate, ["tagged_products.csv"], ["monitoring_report.json"]),
+    "charts": (
+        _run_charts,
+        ["tagged_products.csv"],
+        ["insight_1_market_overview.html", "insight_2_price_landscape.png", "insight_3_opportunity_matrix.png"],
+    ),
+    "feedback": (_run_feedback, ["tagged_products.csv"], ["client_feedback.md"]),
+}
+
+
+# --- Checkpoint bookkeeping ---
+
+def _resolve(session_dir, path):
+    return path if path in MODEL_FILES or os.path.isabs(path) else os.path.join(session_dir, path)
+
+
+def _fingerprint(session_dir, inputs):
+    """Hashes the contents of a stage's inputs; None if any are missing."""
+    digest = hashlib.sha256()
+    for path in inputs:
+        full_path = _resolve(session_dir, path)
+        if not os.path.exists(full_path):
+            return None
+        with open(full_path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+def load_stage_status(session_dir):
+    """Returns the checkpoint record of every stage that has run in this session."""
+    path = os.path.join(session_dir, STAGES_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _save_stage_status(session_dir, status):
+    path = os.path.join(session_dir, STAGES_FILE)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(status, f, indent=2)
+    os.replace(path + ".tmp", path)
+
+
+def run_stage(session_dir, session_id, stage, force=False):
+    """
+    Runs one stage unless its checkpoint is still valid (same input fingerprint
+    and outputs present). Failures are recorded rather than raised.
+    Returns the stage's status: "completed", "cached", "blocked", "failed", or
+    "invalid" when the upload itself is unusable.
+    """
+    if stage not in STAGES:
+        raise ValueError(f"Unknown stage: {stage}")
+    func, inputs, outputs = STAGES[stage]
+    status = load_stage_status(session_dir)
+    record = status.get(stage, {})
+
+    fingerprint = _fingerprint(session_dir, inputs)
+    if fingerprint is None:
+        print(f"⏸️ Stage '{stage}' blocked: inputs not available")
+        status[stage] = {"status": "blocked", "error": "Inputs from an earlier stage are missing."}
+        _save_stage_status(session_dir, status)
+        return "blocked"
+
+    outputs_present = all(os.path.exists(os.path.join(session_dir, out)) for out in outputs)
+    if not force and record.get("status") == "completed" and record.get("fingerprint") == fingerprint and outputs_present:
+        print(f"⏭️ Stage '{stage}' unchanged, using checkpoint")
+        return "cached"
+
+    print(f"▶️ Running stage '{stage}' ...")
+    try:
+        func(session_dir, session_id)
+        status[stage] = {
+            "status": "completed",
+            "fingerprint": fingerprint,
+            "completed_at": datetime.now().isoformat(timespec="seconds"),
+        }
+        result = "completed"
+    except InvalidInputError as e:
+        print(f"❌ Stage '{stage}' rejected the input: {str(e)}")
+        status[stage] = {
+            "status": "invalid",
+            "error": str(e),
+            "failed_at": datetime.now().isoformat(timespec="seconds"),
+        }
+        result = "invalid"
+    except Exception as e:
+        print(f"❌ Stage '{stage}' failed: {str(e)}")
+        status[stage] = {
+            "status": "failed",
+            "error": str(e),
+            "failed_at": datetime.now().isoformat(timespec="seconds"),
+        }
+        result = "failed"
+
+    _save_stage_status(session_dir, status)
+    return result
+
+
+def run_session(session_dir, session_id, stages=None):
+    """
+    Runs the given stages (all by default) in order, reusing valid checkpoints.
+    Stops early if a stage finds the input itself unusable.
+    """
+    results = {}
+    for stage in STAGES:
+        if stages is None or stage in stages:
+            results[stage] = run_stage(session_dir, session_id, stage)
+            if results[stage] == "invalid":
+                break
+    return results